@@ -15,6 +15,7 @@ usando modelos de lenguaje, mostrando una nueva dimensión en las posibilidades
 cadenas y redes de agentes.
 """
 
+import asyncio
 from instantneo.core import InstantNeo
 import openai
 
@@ -34,9 +35,10 @@ No eres un asistente, no puedes decir que eres una IA ni de Openai.
 
 key = "YOUR_API_KEY"
 
-# Inicialización de los personajes
-neo = InstantNeo(key, model, role_neo, max_tokens=700)
-morpheus = InstantNeo(key, model, role_morpheus, max_tokens=700)
+# Inicialización de los personajes.
+# Cada agente guarda su propio historial, así recuerda lo que se ha dicho en la conversación.
+neo = InstantNeo(key, model, role_neo, max_tokens=700, keep_history=True)
+morpheus = InstantNeo(key, model, role_morpheus, max_tokens=700, keep_history=True)
 
 # Número de repeticiones
 repeticiones = 5
@@ -45,17 +47,27 @@ repeticiones = 5
 msg_1 = "Neo no sabe qué es la Matrix. Explícale qué es"
 conversacion = []
 
-# Simulación de la conversación entre Morpheus y Neo
-for _ in range(repeticiones):
-    morpheus_res = morpheus.run(msg_1)
-    morpheus_msg = "Morpheus: " + morpheus_res
-    print("\n" + morpheus_msg)
-    conversacion.append(morpheus_msg)
-    
-    neo_res = neo.run(morpheus_res)
-    neo_msg = "Neo: " + neo_res
-    print("\n" + neo_msg)
-    conversacion.append(neo_msg)
-    
-    msg_1 = neo_res
+# Cada turno muestra la respuesta a medida que el modelo la genera (stream),
+# y al terminar la entrega completa al otro agente.
+async def turno(agente, nombre, mensaje):
+    print(f"\n{nombre}: ", end="", flush=True)
+    partes = []
+    async for token in agente.arun_stream(mensaje):
+        print(token, end="", flush=True)
+        partes.append(token)
+    print()
+    respuesta = "".join(partes)
+    conversacion.append(f"{nombre}: {respuesta}")
+    return respuesta
 
+# Simulación de la conversación entre Morpheus y Neo.
+# Se usa arun_stream para no bloquear el hilo mientras cada agente espera la respuesta del modelo.
+# El diálogo es secuencial (cada agente responde al otro), pero el mismo patrón permite
+# lanzar en paralelo, con asyncio.gather, las llamadas que sean independientes entre sí.
+async def main(msg_1):
+    for _ in range(repeticiones):
+        morpheus_res = await turno(morpheus, "Morpheus", msg_1)
+        neo_res = await turno(neo, "Neo", morpheus_res)
+        msg_1 = neo_res
+
+asyncio.run(main(msg_1))
@@ -1 +1,10 @@
+# InstantNeo se importa solo cuando se usa por primera vez (PEP 562), así
+# "import instantneo" no carga el SDK de OpenAI hasta que es necesario.
+__all__ = ["InstantNeo"]
 
+
+def __getattr__(name):
+    if name == "InstantNeo":
+        from instantneo.core import InstantNeo
+        return InstantNeo
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
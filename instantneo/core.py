@@ -1,8 +1,58 @@
-from openai import OpenAI
+from openai import OpenAI, AsyncOpenAI
+import asyncio
+import hashlib
 import json
 import inspect
+import types
 import typing
+import weakref
 from typing import List, Tuple, Dict, Any, Callable
+from functools import lru_cache
+from collections import OrderedDict
+
+# Número máximo de respuestas guardadas por instancia cuando la caché está activa.
+RESPONSE_CACHE_SIZE = 256
+
+# Equivalencia entre tipos de Python y tipos de datos JSON.
+PYTHON_TO_JSON_TYPES = {
+    int: "integer",
+    float: "number",
+    str: "string",
+    list: "array",
+    tuple: "array",
+    dict: "object",
+    bool: "boolean",
+    type(None): "null",
+}
+# Orígenes de las anotaciones de unión: typing.Union (Optional[X]) y X | None.
+# types.UnionType solo existe desde Python 3.10; en versiones anteriores basta typing.Union.
+UNION_TYPES = (typing.Union, getattr(types, "UnionType", typing.Union))
+# Tipo JSON usado cuando no hay equivalencia (por ejemplo, parámetros sin anotación de tipo).
+DEFAULT_JSON_TYPE = "string"
+
+
+@lru_cache(maxsize=None)
+def _shared_client(api_key: str) -> OpenAI:
+    # Cliente de OpenAI compartido por clave de API. Las instancias de InstantNeo que usan
+    # la misma clave reutilizan así las mismas conexiones HTTP (keep-alive), sin repetir
+    # el handshake TCP/TLS por cada agente.
+    return OpenAI(api_key=api_key)
+
+
+# Clientes asíncronos por event loop y clave de API. Se guardan con referencia débil al loop,
+# así los clientes de un loop cerrado se liberan junto con él.
+_async_clients = weakref.WeakKeyDictionary()
+
+
+def _shared_async_client(api_key: str) -> AsyncOpenAI:
+    # Cliente asíncrono compartido por las instancias que usan la misma clave en el event loop
+    # en curso. Sus conexiones quedan ligadas al loop en que se usa por primera vez, así que
+    # cada loop (por ejemplo, cada llamada a asyncio.run) tiene sus propios clientes.
+    clients = _async_clients.setdefault(asyncio.get_running_loop(), {})
+    client = clients.get(api_key)
+    if client is None:
+        client = clients[api_key] = AsyncOpenAI(api_key=api_key)
+    return client
 
 class InstantNeo:
     def __init__(self, api_key: str, model: str, role_setup: str,
@@ -11,7 +61,10 @@ class InstantNeo:
                  presence_penalty: float = 0.1,
                  frequency_penalty: float = 0.1,
                  skills: List[Callable[..., Any]] = None,
-                 stop=None,):
+                 stop=None,
+                 keep_history: bool = False,
+                 max_history: int = None,
+                 cache: bool = False,):
         # Inicialización de la instancia con configuraciones y habilidades.
         self.skills = skills if skills is not None else []
         self.function_map = {f.__name__: f for f in self.skills}
@@ -22,25 +75,43 @@ class InstantNeo:
         self.stop = stop
         self.presence_penalty = presence_penalty
         self.frequency_penalty = frequency_penalty
-        self.instance = OpenAI(api_key=api_key)
+        # Historial de la conversación. Solo se usa si keep_history es True.
+        self.keep_history = keep_history
+        self.history = []
+        # Número máximo de turnos guardados en el historial. None indica que no hay límite.
+        if max_history is not None and max_history < 1:
+            raise ValueError("max_history debe ser None o un entero mayor o igual a 1.")
+        self.max_history = max_history
+        # Caché de respuestas. Solo se usa si cache es True.
+        self.cache = cache
+        self._response_cache = OrderedDict()
+        # Solicitudes asíncronas cacheables en curso, por clave de caché.
+        self._pending_requests = {}
+        self.instance = _shared_client(api_key)
+        # El cliente asíncrono se obtiene en cada event loop al usarse (ver async_instance).
+        self._api_key = api_key
+        # Las habilidades no cambian después de crear la instancia, así que su esquema
+        # se construye una sola vez en lugar de en cada llamada al modelo.
+        self.skills_schema = self.set_up_skills()
+        self._skill_names = frozenset(skill["name"] for skill in self.skills_schema)
+        # Parámetros que acepta cada habilidad, para descartar argumentos que el modelo invente.
+        # None indica que la función acepta cualquier argumento (**kwargs).
+        self._skill_parameters = {name: self.accepted_parameters(function)
+                                  for name, function in self.function_map.items()}
+        # Mensaje de sistema por defecto, reutilizado en cada llamada que no cambie role_setup.
+        # Se reconstruye si se asigna un nuevo self.role_setup. No debe modificarse.
+        self._system_message = {"role": "system", "content": role_setup}
+
+    @property
+    def async_instance(self):
+        # Cliente asíncrono para el event loop en curso, compartido con las demás instancias
+        # que usan la misma clave de API en ese loop.
+        return _shared_async_client(self._api_key)
 
     @staticmethod
     def python_type_to_string(python_type):
         # Convierte tipos de Python a su representación como tipos de datos JSON.
-        if python_type in [int, float]:
-            return "number"
-        elif python_type is str:
-            return "string"
-        elif python_type in [list, tuple]:
-            return "array"
-        elif python_type is dict:
-            return "object"
-        elif python_type is bool:
-            return "boolean"
-        elif python_type is type(None):
-            return "null"
-        else:
-            return "unknown"
+        return PYTHON_TO_JSON_TYPES.get(python_type, DEFAULT_JSON_TYPE)
     
     @staticmethod
     def serialize_argument(arg):
@@ -49,6 +120,16 @@ class InstantNeo:
             return json.dumps(arg)
         return arg
 
+    @staticmethod
+    def accepted_parameters(function):
+        # Retorna los nombres de los parámetros que acepta la función por nombre, o None si acepta **kwargs.
+        # Se excluyen *args y los parámetros solo posicionales, que no pueden pasarse como argumentos con nombre.
+        parameters = inspect.signature(function).parameters.values()
+        if any(param.kind is param.VAR_KEYWORD for param in parameters):
+            return None
+        return frozenset(param.name for param in parameters
+                         if param.kind in (param.POSITIONAL_OR_KEYWORD, param.KEYWORD_ONLY))
+
     @staticmethod
     def extract_parameter_descriptions(function):
         # Extrae descripciones de los parámetros de las funciones a partir de sus docstrings.
@@ -84,75 +165,91 @@ class InstantNeo:
             properties = {}
             required = []
             for name, param in params_info.items():
-                param_type = self.python_type_to_string(param.annotation)
+                annotation = param.annotation
                 description = param_descriptions.get(name, "")
+                # Optional[X] y X | None se describen con el tipo de X
+                origin = typing.get_origin(annotation)
+                if origin in UNION_TYPES:
+                    non_null_types = [arg for arg in typing.get_args(annotation) if arg is not type(None)]
+                    if len(non_null_types) == 1:
+                        annotation = non_null_types[0]
+                        origin = typing.get_origin(annotation)
                 # Procesamiento específico para tipos de datos
                 # Aquí excluimos diccionarios, pues no los admite el API de OpenAI
-                if isinstance(param.annotation, typing._GenericAlias):
-                    if param.annotation.__origin__ in [list, typing.List]:
-                        if param.annotation.__args__:
-                            element_type = self.python_type_to_string(param.annotation.__args__[0])
-                        else:
-                            element_type = "unknown"
-                        item_schema = {"type": element_type}
-                        properties[name] = {
-                            "type": "array",
-                            "items": item_schema,
-                            "description": description,
-                        }
-                    # Excluyendo el manejo de diccionarios.
-                    elif param.annotation.__origin__ in [dict, typing.Dict]:
-                        raise TypeError("Las funciones con diccionarios como argumentos no son soportadas.")
+                if origin in (list, tuple):
+                    # Listas y tuplas con un solo tipo de elementos. Se ignora el "..." de Tuple[int, ...]
+                    element_types = {self.python_type_to_string(arg)
+                                     for arg in typing.get_args(annotation) if arg is not Ellipsis}
+                    if len(element_types) == 1:
+                        element_type = element_types.pop()
+                    else:
+                        element_type = DEFAULT_JSON_TYPE
+                    item_schema = {"type": element_type}
+                    properties[name] = {
+                        "type": "array",
+                        "items": item_schema,
+                        "description": description,
+                    }
+                # Excluyendo el manejo de diccionarios.
+                elif origin is dict:
+                    raise TypeError("Las funciones con diccionarios como argumentos no son soportadas.")
                 else:
+                    # Cualquier otro tipo, genérico o no, se describe como un valor simple;
+                    # los que no tienen equivalencia en JSON usan DEFAULT_JSON_TYPE.
                     properties[name] = {
-                        "type": param_type,
+                        "type": self.python_type_to_string(annotation),
                         "description": description,
                     }
 
                 if param.default is param.empty:
                     required.append(name)
 
-                skill = {
-                    "name": function.__name__,
-                    "description": f"Descripción de {function.__name__}",
-                    "parameters": {
-                        "type": "object",
-                        "properties": properties,
-                        "required": required,
-                    },
-                }
-                skills.append(skill)
+            skill = {
+                "name": function.__name__,
+                "description": f"Descripción de {function.__name__}",
+                "parameters": {
+                    "type": "object",
+                    "properties": properties,
+                    "required": required,
+                },
+            }
+            skills.append(skill)
         return skills
 
-    def run(self,
-            prompt: str,
-            model: str = None,
-            role_setup: str = None,
-            temperature: float = None,
-            max_tokens: int = None,
-            stop=None,
-            presence_penalty: float = None,
-            frequency_penalty: float = None,
-            return_full_response: bool = False):
-        
-        # Configuración y ejecución de la solicitud al modelo.
-        
-        model = model or self.model
-        role_setup = role_setup or self.role_setup
-        temperature = temperature or self.temperature
-        max_tokens = max_tokens or self.max_tokens
-        stop = stop or self.stop
-        presence_penalty = presence_penalty or self.presence_penalty
-        frequency_penalty = frequency_penalty or self.frequency_penalty
-
-        # Configurar habilidades para la instancia
-        skills = self.set_up_skills()
-
-        # Solicitud al modelo de OpenAI. Preparar argumentos para la solicitud
+    def _prepare_chat_args(self,
+                           prompt: str,
+                           model: str = None,
+                           role_setup: str = None,
+                           temperature: float = None,
+                           max_tokens: int = None,
+                           stop=None,
+                           presence_penalty: float = None,
+                           frequency_penalty: float = None):
+        # Configuración de la solicitud al modelo, común a run y arun.
+
+        # Los valores no indicados (None) toman la configuración de la instancia. Se compara
+        # con None y no con "or" para respetar valores como temperature=0.
+        model = self.model if model is None else model
+        if role_setup is None:
+            if self._system_message["content"] is not self.role_setup:
+                self._system_message = {"role": "system", "content": self.role_setup}
+            system_message = self._system_message
+        else:
+            system_message = {"role": "system", "content": role_setup}
+        temperature = self.temperature if temperature is None else temperature
+        max_tokens = self.max_tokens if max_tokens is None else max_tokens
+        stop = self.stop if stop is None else stop
+        presence_penalty = self.presence_penalty if presence_penalty is None else presence_penalty
+        frequency_penalty = self.frequency_penalty if frequency_penalty is None else frequency_penalty
+
+        # Solicitud al modelo de OpenAI. Preparar argumentos para la solicitud.
+        # El mensaje de sistema va siempre primero y sin cambios entre llamadas, para que
+        # OpenAI pueda reutilizar el prefijo ya procesado (prompt caching) en cada turno.
         chat_args = {
             "model": model,
             "messages": [
-                {"role": "system", "content": role_setup},
+                system_message,
+                *self.history,
                 {"role": "user", "content": prompt}
             ],
             "temperature": temperature,
@@ -162,41 +259,307 @@ class InstantNeo:
             "frequency_penalty": frequency_penalty
         }
         # # Solicitud al modelo de OpenAI. Incluir habilidades si están disponibles
-        if skills:
-            chat_args["functions"] = skills
+        # Las habilidades de la instancia ya están configuradas en __init__
+        if self.skills_schema:
+            chat_args["functions"] = self.skills_schema
             chat_args["function_call"] = "auto"
+        return chat_args
+
+    def _call_function(self, function_name, arguments_str, allow_async=False):
+        # Ejecuta la función solicitada por el modelo, si está entre las habilidades permitidas.
+        # Las habilidades asíncronas solo se admiten desde arun y arun_stream (allow_async=True).
+        arguments_dic = json.loads(arguments_str)
+        if function_name in self._skill_names:
+            function = self.function_map.get(function_name)
+            if function:
+                accepted = self._skill_parameters[function_name]
+                if accepted is not None:
+                    arguments_dic = {key: value for key, value in arguments_dic.items() if key in accepted}
+                result = function(**arguments_dic)
+                if inspect.isawaitable(result) and not allow_async:
+                    # Se cierra la corrutina para que Python no advierta que nunca se esperó
+                    if inspect.iscoroutine(result):
+                        result.close()
+                    raise ValueError(f"La función '{function_name}' es asíncrona; usa arun o arun_stream.")
+                return result
+            else:
+                raise ValueError(f'Función no encontrada: {function_name}')
+        else:
+            raise ValueError(f'Función no permitida: {function_name}')
+
+    def _cache_key(self, chat_args):
+        # Clave de caché de una solicitud: hash de sus argumentos. Solo se cachean solicitudes
+        # deterministas (temperature igual a 0); en otro caso retorna None.
+        if not self.cache or chat_args["temperature"] != 0:
+            return None
+        payload = json.dumps(chat_args, sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    def _get_cached_response(self, key):
+        # Retorna la respuesta guardada para la clave, o None si no existe.
+        if key is None or key not in self._response_cache:
+            return None
+        self._response_cache.move_to_end(key)
+        return self._response_cache[key]
+
+    def _save_cached_response(self, key, response):
+        # Guarda la respuesta, descartando la menos usada si se supera RESPONSE_CACHE_SIZE.
+        if key is None:
+            return
+        self._response_cache[key] = response
+        while len(self._response_cache) > RESPONSE_CACHE_SIZE:
+            self._response_cache.popitem(last=False)
+
+    def _append_turn(self, prompt, *messages):
+        # Agrega el turno (el prompt y los mensajes de respuesta) al final del historial.
+        # Los mensajes anteriores no se modifican, así el prefijo enviado al modelo se repite
+        # igual en cada llamada y el proveedor puede reutilizarlo de su caché.
+        self.history.append({"role": "user", "content": prompt})
+        self.history.extend(messages)
+        if self.max_history is not None:
+            # Al superar max_history se descartan los turnos más antiguos completos, de modo que
+            # el historial empiece siempre con un mensaje del usuario.
+            user_indexes = [i for i, message in enumerate(self.history) if message["role"] == "user"]
+            if len(user_indexes) > self.max_history:
+                del self.history[:user_indexes[-self.max_history]]
+
+    def _update_history(self, prompt, answer):
+        # Guarda un turno respondido con texto, si la instancia mantiene la conversación.
+        if self.keep_history:
+            self._append_turn(prompt, {"role": "assistant", "content": answer})
+
+    def _update_function_history(self, prompt, function_name, arguments_str, result):
+        # Guarda un turno respondido con una habilidad: la llamada del modelo y el resultado
+        # de la función, en el formato de mensajes "function" de OpenAI.
+        if self.keep_history:
+            content = result if isinstance(result, str) else json.dumps(result, default=str)
+            self._append_turn(
+                prompt,
+                {"role": "assistant", "content": None,
+                 "function_call": {"name": function_name, "arguments": arguments_str}},
+                {"role": "function", "name": function_name, "content": content},
+            )
+
+    async def _await_function_result(self, prompt, function_name, arguments_str, result):
+        # Espera el resultado de una habilidad asíncrona y luego guarda el turno en el historial.
+        result = await result
+        self._update_function_history(prompt, function_name, arguments_str, result)
+        return result
+
+    def clear_history(self):
+        # Borra el historial de la conversación.
+        self.history = []
+
+    def _process_response(self, response, prompt, allow_async=False):
+        # Procesar la respuesta para ver si incluye la llamada a una función como respuesta del modelo
+        message = response.choices[0].message
+        function_call = message.function_call
+        if function_call:
+            # Si el modelo responde con una llamada a una función, se extrae la información
+            # de la función y se ejecuta directamente
+            result = self._call_function(function_call.name, function_call.arguments, allow_async)
+            if inspect.isawaitable(result):
+                return self._await_function_result(prompt, function_call.name,
+                                                   function_call.arguments, result)
+            self._update_function_history(prompt, function_call.name, function_call.arguments, result)
+            return result
+        # Si no se llama a una función, retorna el contenido de la respuesta
+        elif message.content:
+            self._update_history(prompt, message.content)
+            return message.content
+
+        else:
+            raise ValueError('No se encontró contenido ni llamada a función en la respuesta.')
+
+    def run(self,
+            prompt: str,
+            model: str = None,
+            role_setup: str = None,
+            temperature: float = None,
+            max_tokens: int = None,
+            stop=None,
+            presence_penalty: float = None,
+            frequency_penalty: float = None,
+            return_full_response: bool = False):
+
+        # Configuración y ejecución de la solicitud al modelo.
+        chat_args = self._prepare_chat_args(prompt, model, role_setup, temperature,
+                                            max_tokens, stop, presence_penalty,
+                                            frequency_penalty)
 
         try:
-            # Realizar la solicitud al modelo de OpenAI
-            response = self.instance.chat.completions.create(**chat_args)
+            # Realizar la solicitud al modelo de OpenAI, salvo que la respuesta ya esté en caché.
+            # Se guarda la respuesta del modelo y no el resultado de las funciones, así las
+            # habilidades se vuelven a ejecutar en cada llamada.
+            cache_key = self._cache_key(chat_args)
+            response = self._get_cached_response(cache_key)
+            if response is None:
+                response = self.instance.chat.completions.create(**chat_args)
+                self._save_cached_response(cache_key, response)
             # Retornar respuesta completa si se solicita.
             # La respuesta completa es un JSON que incluye la respuesta y metadata
             if return_full_response:
                 return response
-            # Procesar la respuesta para ver si incluye la llamada a una función como respuesta del modelo
-            function_call = response.choices[0].message.function_call
-            if function_call:
-                # Si el modelo responde con una llamada a una función, se extrae la información de la función
-                function_name = function_call.name
-                arguments_str = function_call.arguments
-                arguments_dic = json.loads(arguments_str)
-                #Se ejecuta directamente la función
-                is_valid_function = any(skill["name"] == function_name for skill in skills)
-                if is_valid_function:
-                    function = self.function_map.get(function_name)
-                    if function:
-                        result = function(**arguments_dic)
-                        return result
-                    else:
-                        raise ValueError(f'Función no encontrada: {function_name}')
-                else:
-                    raise ValueError(f'Función no permitida: {function_name}')
-            # Si no se llama a una función, retorna el contenido de la respuesta
-            elif response.choices[0].message.content:
-                return response.choices[0].message.content
+            return self._process_response(response, prompt)
 
-            else:
-                raise ValueError('No se encontró contenido ni llamada a función en la respuesta.')
+        except Exception as e:
+            return str(e)
+
+    async def _acreate_completion(self, cache_key, chat_args):
+        # Solicitud asíncrona al modelo. Si ya hay en curso una solicitud idéntica y cacheable
+        # (misma clave de caché), se espera su respuesta en lugar de repetir la llamada a la API.
+        if cache_key is None:
+            return await self.async_instance.chat.completions.create(**chat_args)
+        pending = self._pending_requests.get(cache_key)
+        if pending is None:
+            pending = asyncio.ensure_future(self.async_instance.chat.completions.create(**chat_args))
+            self._pending_requests[cache_key] = pending
+            pending.add_done_callback(lambda task: self._finish_pending_request(cache_key, task))
+        # shield evita que cancelar a quien espera cancele la solicitud compartida; aunque
+        # nadie la espere, su respuesta se guarda en la caché al terminar.
+        return await asyncio.shield(pending)
+
+    def _finish_pending_request(self, cache_key, task):
+        # Al terminar una solicitud compartida, se quita de las pendientes y se guarda su respuesta.
+        # Consultar task.exception() marca el error como recibido, aunque nadie esperara la tarea.
+        del self._pending_requests[cache_key]
+        if not task.cancelled() and task.exception() is None:
+            self._save_cached_response(cache_key, task.result())
+
+    async def arun(self,
+                   prompt: str,
+                   model: str = None,
+                   role_setup: str = None,
+                   temperature: float = None,
+                   max_tokens: int = None,
+                   stop=None,
+                   presence_penalty: float = None,
+                   frequency_penalty: float = None,
+                   return_full_response: bool = False):
+
+        # Versión asíncrona de run. No bloquea el hilo mientras se espera la respuesta
+        # del modelo, lo que permite ejecutar varias solicitudes de forma concurrente.
+        chat_args = self._prepare_chat_args(prompt, model, role_setup, temperature,
+                                            max_tokens, stop, presence_penalty,
+                                            frequency_penalty)
+
+        try:
+            cache_key = self._cache_key(chat_args)
+            response = self._get_cached_response(cache_key)
+            if response is None:
+                response = await self._acreate_completion(cache_key, chat_args)
+            if return_full_response:
+                return response
+            result = self._process_response(response, prompt, allow_async=True)
+            # Las habilidades pueden ser funciones asíncronas (async def)
+            if inspect.isawaitable(result):
+                result = await result
+            return result
 
         except Exception as e:
             return str(e)
+
+    async def arun_many(self, prompts: List[str], max_concurrency: int = 16, **kwargs):
+        # Ejecuta varios prompts independientes de forma concurrente y retorna sus respuestas
+        # en el mismo orden. Acepta los mismos parámetros opcionales que arun.
+        # max_concurrency limita las solicitudes simultáneas, para no exceder los límites de la API.
+        if max_concurrency < 1:
+            raise ValueError("max_concurrency debe ser un entero mayor o igual a 1.")
+        semaphore = asyncio.Semaphore(max_concurrency)
+
+        async def run_one(prompt):
+            async with semaphore:
+                return await self.arun(prompt, **kwargs)
+
+        return await asyncio.gather(*(run_one(prompt) for prompt in prompts))
+
+    @staticmethod
+    def _read_stream_chunk(chunk, function_call_parts):
+        # Extrae el texto de un fragmento del stream. Si el fragmento es parte de una llamada
+        # a función, acumula su nombre y argumentos en function_call_parts y no retorna texto.
+        if not chunk.choices:
+            return None
+        delta = chunk.choices[0].delta
+        if delta.function_call:
+            if delta.function_call.name:
+                function_call_parts["name"] = delta.function_call.name
+            if delta.function_call.arguments:
+                function_call_parts["arguments"].append(delta.function_call.arguments)
+            return None
+        return delta.content
+
+    def run_stream(self,
+                   prompt: str,
+                   model: str = None,
+                   role_setup: str = None,
+                   temperature: float = None,
+                   max_tokens: int = None,
+                   stop=None,
+                   presence_penalty: float = None,
+                   frequency_penalty: float = None):
+
+        # Versión de run que entrega la respuesta por partes, a medida que el modelo la genera.
+        # Si el modelo llama a una función, se ejecuta al terminar el stream y se entrega su resultado.
+        chat_args = self._prepare_chat_args(prompt, model, role_setup, temperature,
+                                            max_tokens, stop, presence_penalty,
+                                            frequency_penalty)
+        chat_args["stream"] = True
+        function_call_parts = {"name": None, "arguments": []}
+        content_parts = []
+
+        try:
+            for chunk in self.instance.chat.completions.create(**chat_args):
+                content = self._read_stream_chunk(chunk, function_call_parts)
+                if content:
+                    content_parts.append(content)
+                    yield content
+            if function_call_parts["name"]:
+                # Una habilidad sin parámetros puede llegar sin fragmentos de argumentos
+                arguments_str = "".join(function_call_parts["arguments"]) or "{}"
+                result = self._call_function(function_call_parts["name"], arguments_str)
+                self._update_function_history(prompt, function_call_parts["name"], arguments_str, result)
+                yield result
+            elif content_parts:
+                self._update_history(prompt, "".join(content_parts))
+
+        except Exception as e:
+            yield str(e)
+
+    async def arun_stream(self,
+                          prompt: str,
+                          model: str = None,
+                          role_setup: str = None,
+                          temperature: float = None,
+                          max_tokens: int = None,
+                          stop=None,
+                          presence_penalty: float = None,
+                          frequency_penalty: float = None):
+
+        # Versión asíncrona de run_stream, para usar con "async for".
+        chat_args = self._prepare_chat_args(prompt, model, role_setup, temperature,
+                                            max_tokens, stop, presence_penalty,
+                                            frequency_penalty)
+        chat_args["stream"] = True
+        function_call_parts = {"name": None, "arguments": []}
+        content_parts = []
+
+        try:
+            async for chunk in await self.async_instance.chat.completions.create(**chat_args):
+                content = self._read_stream_chunk(chunk, function_call_parts)
+                if content:
+                    content_parts.append(content)
+                    yield content
+            if function_call_parts["name"]:
+                # Una habilidad sin parámetros puede llegar sin fragmentos de argumentos
+                arguments_str = "".join(function_call_parts["arguments"]) or "{}"
+                result = self._call_function(function_call_parts["name"], arguments_str,
+                                             allow_async=True)
+                if inspect.isawaitable(result):
+                    result = await result
+                self._update_function_history(prompt, function_call_parts["name"], arguments_str, result)
+                yield result
+            elif content_parts:
+                self._update_history(prompt, "".join(content_parts))
+
+        except Exception as e:
+            yield str(e)
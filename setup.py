@@ -1,17 +1,26 @@
 from setuptools import setup, find_packages
 
+
+def _read_readme():
+    # Se lee con 'with' para cerrar el archivo; sin README (p. ej. sdist recortado) se usa ''
+    try:
+        with open('README.md', encoding='utf-8') as readme:
+            return readme.read()
+    except FileNotFoundError:
+        return ''
+
+
 setup(
     name='instantneo',
     version='0.1.0',
     packages=find_packages(),
     install_requires=[
         'openai',
-        'typing',
     ],
     author='Diego Ponce de León Franco',
     author_email='dponcedeleonf@gmail.com',
     description='', 
-    long_description=open('README.md').read(),
+    long_description=_read_readme(),
     long_description_content_type='text/markdown',
     url='https://github.com/dponcedeleonf/instantneo',
     classifiers=[